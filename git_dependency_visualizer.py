@@ -1,7 +1,15 @@
 import os
 import subprocess
 import argparse
-from typing import Dict, Set
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set
+
+try:
+    import pygit2
+except ImportError:
+    # pygit2 не обязателен: без него граф строится через вызовы git
+    pygit2 = None
 
 class GitDependencyVisualizer:
     def __init__(self, repo_path: str):
@@ -11,21 +19,130 @@ class GitDependencyVisualizer:
         :param repo_path: Путь к git-репозиторию
         """
         self.repo_path = os.path.abspath(repo_path)
+        # Долгоживущий процесс git cat-file --batch, запускается при первом обращении
+        self._catfile = None
+        # Родители коммитов, прочитанных через cat-file: объекты git неизменяемы,
+        # поэтому кеш по полному хешу не требует инвалидации
+        self._parent_cache: Dict[str, Set[str]] = {}
+        # При наличии pygit2 история читается в процессе через libgit2
+        self._use_pygit2 = pygit2 is not None
+        self._repository = None
+        # Общий граф нескольких запрошенных веток, загружается visualize_many
+        # одним вызовом rev-list, чтобы общая история читалась один раз
+        self._full_graph: Optional[Dict[str, Set[str]]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        Завершение фонового процесса git cat-file, если он был запущен.
+        """
+        catfile = getattr(self, '_catfile', None)
+        if catfile is None:
+            return
+        self._catfile = None
+        try:
+            catfile.stdin.close()
+        except OSError:
+            pass
+        try:
+            catfile.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            catfile.kill()
+            catfile.wait()
+        catfile.stdout.close()
+
+    def _get_catfile(self) -> subprocess.Popen:
+        """
+        Получение (с запуском при необходимости) процесса git cat-file --batch.
+        
+        :return: Процесс, принимающий ревизии через stdin
+        """
+        if self._catfile is None or self._catfile.poll() is not None:
+            self._catfile = subprocess.Popen(
+                ['git', '-C', self.repo_path, 'cat-file', '--batch'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+        return self._catfile
+
+    def _resolve_commit(self, rev: str) -> Optional[str]:
+        """
+        Получение хеша коммита, на который указывает ревизия, через git rev-parse.
+        
+        :param rev: Имя ветки или другая ревизия
+        :return: Хеш-значение коммита или None, если ревизия не найдена
+        """
+        # rev-parse не обходит историю, в отличие от git rev-list
+        try:
+            return subprocess.check_output(
+                ['git', '-C', self.repo_path, 'rev-parse', '--verify', '--quiet', f"{rev}^{{commit}}"],
+                stderr=subprocess.DEVNULL,
+                universal_newlines=True
+            ).strip()
+        except subprocess.CalledProcessError:
+            return None
 
-    def get_branch_commits(self, branch_name: str) -> Set[str]:
+    def _require_commit(self, branch_name: str) -> str:
+        """
+        Получение хеша вершины ветки с проверкой ее существования.
+        
+        :param branch_name: Имя ветки
+        :return: Хеш-значение коммита
+        :raises RuntimeError: Если ветка не найдена
+        """
+        tip = self._resolve_commit(branch_name)
+        if tip is None:
+            raise RuntimeError(f"Ветка {branch_name} не найдена в репозитории {self.repo_path}")
+        return tip
+
+    def _iter_rev_list(self, *args: str) -> Iterator[str]:
+        """
+        Построчное чтение вывода git rev-list без буферизации всего вывода в памяти.
+        
+        :param args: Аргументы git rev-list
+        :return: Итератор по непустым строкам вывода
+        :raises subprocess.CalledProcessError: Если git завершился с ошибкой
+        """
+        cmd = ['git', '-C', self.repo_path, 'rev-list', *args]
+        # stderr не перехватывается: сообщения git выводятся в терминал, как при check_output
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            universal_newlines=True
+        )
+        try:
+            for line in process.stdout:
+                line = line.rstrip('\n')
+                if line:
+                    yield line
+            if process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, cmd)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+    def get_branch_commits(self, branch_name: str, max_depth: Optional[int] = None) -> Set[str]:
         """
         Получение списка всех коммитов для указанной ветки.
         
         :param branch_name: Имя ветки
+        :param max_depth: Максимальное число последних коммитов (по умолчанию — вся история)
         :return: Множество хеш-значений коммитов
+        :raises ValueError: Если max_depth меньше 1
         """
+        _check_max_depth(max_depth)
         try:
-            commits = subprocess.check_output(
-                ['git', 'rev-list', branch_name],
-                cwd=self.repo_path,
-                universal_newlines=True
-            ).strip().split('\n')
-            return set(commits)
+            return set(self._iter_rev_list(*_max_count_args(max_depth), branch_name))
         except subprocess.CalledProcessError as e:
             raise RuntimeError(f"Ошибка получения коммитов для ветки {branch_name}: {e}")
 
@@ -36,27 +153,146 @@ class GitDependencyVisualizer:
         :param commit_hash: Хеш-значение коммита
         :return: Множество хеш-значений родительских коммитов
         """
+        # Граф, возвращенный вызывающему коду, не используется: его могут изменить
+        for known in (self._parent_cache, self._full_graph or {}):
+            cached = known.get(commit_hash)
+            if cached is not None:
+                return set(cached)
+        if not commit_hash or '\n' in commit_hash:
+            return set()
+
+        # Вместо запуска git log на каждый коммит запрос пишется в stdin
+        # уже запущенного git cat-file --batch
+        catfile = self._get_catfile()
         try:
-            parents = subprocess.check_output(
-                ['git', 'log', '-n', '1', '--pretty=%P', commit_hash],
-                cwd=self.repo_path,
-                universal_newlines=True
-            ).strip().split()
-            return set(parents)
-        except subprocess.CalledProcessError:
+            catfile.stdin.write(f"{commit_hash}^{{commit}}\n".encode())
+            catfile.stdin.flush()
+            header = catfile.stdout.readline().split()
+            if len(header) != 3 or header[1] != b'commit':
+                return set()
+            # Содержимое объекта и завершающий перевод строки
+            content = catfile.stdout.read(int(header[2]) + 1)
+        except (OSError, ValueError):
+            self.close()
             return set()
 
-    def build_dependency_graph(self, branch_name: str) -> Dict[str, Set[str]]:
+        parents = set()
+        for line in content.split(b'\n'):
+            if not line:
+                # Заголовки коммита заканчиваются пустой строкой
+                break
+            if line.startswith(b'parent '):
+                parents.add(line[len(b'parent '):].decode())
+        self._parent_cache[header[0].decode()] = parents
+        return set(parents)
+
+    def build_dependency_graph(self, branch_name: str, max_depth: Optional[int] = None) -> Dict[str, Set[str]]:
         """
         Построение графа зависимостей коммитов, включая транзитивные зависимости.
         
         :param branch_name: Имя ветки
+        :param max_depth: Максимальное число последних коммитов (по умолчанию — вся история)
         :return: Словарь зависимостей коммитов
+        :raises ValueError: Если max_depth меньше 1
         """
-        commits = self.get_branch_commits(branch_name)
-        graph = {commit: self.get_commit_parents(commit) for commit in commits}
+        _check_max_depth(max_depth)
+        if self._use_pygit2:
+            graph = self._build_dependency_graph_pygit2(branch_name, max_depth)
+        else:
+            graph = self._build_dependency_graph_git(branch_name, max_depth)
         return graph
 
+    def _build_dependency_graph_pygit2(self, branch_name: str,
+                                       max_depth: Optional[int] = None) -> Dict[str, Set[str]]:
+        """
+        Построение графа зависимостей обходом истории через libgit2, без запуска git.
+        
+        :param branch_name: Имя ветки
+        :param max_depth: Максимальное число последних коммитов
+        :return: Словарь зависимостей коммитов
+        """
+        try:
+            if self._repository is None:
+                self._repository = pygit2.Repository(self.repo_path)
+            tip = self._repository.revparse_single(branch_name).peel(pygit2.Commit)
+        except (KeyError, ValueError, pygit2.GitError) as e:
+            raise RuntimeError(f"Ошибка получения коммитов для ветки {branch_name}: {e}")
+
+        graph = {}
+        names: Dict[str, str] = {}
+        if max_depth is None:
+            commits = self._repository.walk(tip.id, pygit2.GIT_SORT_NONE)
+        else:
+            # Тот же порядок, что у git rev-list --max-count: от новых коммитов к старым
+            commits = islice(self._repository.walk(tip.id, pygit2.GIT_SORT_TIME), max_depth)
+        for commit in commits:
+            commit_hash = str(commit.id)
+            graph[names.setdefault(commit_hash, commit_hash)] = {
+                names.setdefault(parent, parent) for parent in map(str, commit.parent_ids)
+            }
+        return graph
+
+    def _build_dependency_graph_git(self, branch_name: str,
+                                    max_depth: Optional[int] = None) -> Dict[str, Set[str]]:
+        """
+        Построение графа зависимостей по выводу git rev-list --parents.
+        
+        :param branch_name: Имя ветки
+        :param max_depth: Максимальное число последних коммитов
+        :return: Словарь зависимостей коммитов
+        """
+        try:
+            return self._read_parents_graph(*_max_count_args(max_depth), branch_name)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Ошибка получения коммитов для ветки {branch_name}: {e}")
+
+    def _load_shared_graph(self, tips: List[str]) -> Dict[str, Set[str]]:
+        """
+        Построение общего графа нескольких веток одним вызовом git rev-list --parents.
+        
+        :param tips: Хеш-значения вершин веток
+        :return: Словарь зависимостей коммитов, достижимых из любой из вершин
+        """
+        try:
+            self._full_graph = self._read_parents_graph(*tips)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Ошибка получения коммитов веток: {e}")
+        return self._full_graph
+
+    def _read_parents_graph(self, *args: str) -> Dict[str, Set[str]]:
+        """
+        Чтение графа зависимостей из вывода git rev-list --parents.
+        
+        :param args: Дополнительные аргументы git rev-list
+        :return: Словарь зависимостей коммитов
+        :raises subprocess.CalledProcessError: Если git завершился с ошибкой
+        """
+        # Один вызов rev-list --parents вместо отдельного git log на каждый коммит:
+        # каждая строка вывода — хеш коммита, за которым следуют хеши его родителей
+        graph = {}
+        # Каждый хеш встречается в выводе несколько раз (как коммит и как родитель);
+        # хранится один общий объект строки на хеш
+        names: Dict[str, str] = {}
+        for line in self._iter_rev_list('--parents', *args):
+            commit, *parents = [names.setdefault(h, h) for h in line.split()]
+            graph[commit] = set(parents)
+        return graph
+
+    def render_mermaid_graph(self, graph: Dict[str, Set[str]]) -> str:
+        """
+        Представление графа зависимостей в формате Mermaid.
+        
+        :param graph: Граф зависимостей
+        :return: Текст графа Mermaid
+        """
+        lines = ["graph TD\n"]
+        lines.extend(
+            "  %s --> %s\n" % (parent[:7], commit[:7])
+            for commit, parents in graph.items()
+            for parent in parents
+        )
+        return ''.join(lines)
+
     def save_mermaid_graph(self, graph: Dict[str, Set[str]], output_path: str):
         """
         Сохранение графа зависимостей в формате Mermaid.
@@ -64,65 +300,229 @@ class GitDependencyVisualizer:
         :param graph: Граф зависимостей
         :param output_path: Путь для сохранения Mermaid файла
         """
+        # Одна запись вместо отдельного write на каждое ребро
         with open(output_path, 'w') as f:
-            f.write("graph TD\n")
-            for commit, parents in graph.items():
-                for parent in parents:
-                    f.write(f"  {parent[:7]} --> {commit[:7]}\n")
+            f.write(self.render_mermaid_graph(graph))
 
-    def generate_png(self, mermaid_path: str, output_path: str, visualizer_path: str):
+    @staticmethod
+    def generate_png(mermaid_source: str, output_path: str, visualizer_path: str):
         """
-        Генерация PNG-изображения из файла Mermaid.
+        Генерация PNG-изображения из текста Mermaid.
+        
+        Текст передается визуализатору через stdin, без промежуточного файла.
         
-        :param mermaid_path: Путь к файлу Mermaid
+        :param mermaid_source: Текст графа Mermaid
         :param output_path: Путь для сохранения PNG
         :param visualizer_path: Путь к программе для генерации графов
         """
         try:
             subprocess.run(
-                [visualizer_path, '-i', mermaid_path, '-o', output_path],
+                [visualizer_path, '-i', '-', '-o', output_path],
+                input=mermaid_source,
+                universal_newlines=True,
                 check=True
             )
         except subprocess.CalledProcessError as e:
             raise RuntimeError(f"Ошибка генерации PNG: {e}")
 
-    def visualize_dependencies(self, branch_name: str, output_path: str, visualizer_path: str = 'mmdc'):
+    def visualize_dependencies(self, branch_name: str, output_path: str, visualizer_path: str = 'mmdc',
+                               max_depth: Optional[int] = None):
         """
         Построение, сохранение и визуализация графа зависимостей.
         
         :param branch_name: Имя ветки
         :param output_path: Путь для сохранения PNG
         :param visualizer_path: Путь к программе визуализации Mermaid
+        :param max_depth: Максимальное число последних коммитов (по умолчанию — вся история)
         """
+        # Проверить существование ветки до обхода истории
+        self._require_commit(branch_name)
+
         # Построить граф зависимостей
-        graph = self.build_dependency_graph(branch_name)
+        graph = self.build_dependency_graph(branch_name, max_depth)
 
-        # Сохранить Mermaid файл
-        mermaid_path = os.path.splitext(output_path)[0] + '.mmd'
-        self.save_mermaid_graph(graph, mermaid_path)
+        # Генерировать PNG из Mermaid, передавая граф визуализатору напрямую
+        self.generate_png(self.render_mermaid_graph(graph), output_path, visualizer_path)
 
-        # Генерировать PNG из Mermaid
-        self.generate_png(mermaid_path, output_path, visualizer_path)
+    @classmethod
+    def visualize_many(cls, repo_path: str, branches: List[str], out_dir: str,
+                       visualizer_path: str = 'mmdc', n_jobs: Optional[int] = None,
+                       max_depth: Optional[int] = None) -> Dict[str, str]:
+        """
+        Параллельная визуализация графов зависимостей нескольких веток.
+        
+        При полном обходе через git история всех веток читается одним вызовом
+        rev-list, а графы веток выделяются из общего графа в памяти; в потоках
+        выполняется только ожидание визуализатора. С pygit2 или max_depth
+        каждый дочерний процесс строит граф своей ветки сам. Каждая ветка
+        сохраняется в собственный файл.
+        
+        :param repo_path: Путь к git-репозиторию
+        :param branches: Имена веток
+        :param out_dir: Каталог для сохранения PNG
+        :param visualizer_path: Путь к программе визуализации Mermaid
+        :param n_jobs: Число параллельных задач (по умолчанию — число ядер)
+        :param max_depth: Максимальное число последних коммитов каждой ветки
+        :return: Словарь путей к PNG по именам веток
+        :raises ValueError: Если не указано веток, n_jobs или max_depth меньше 1
+        """
+        branches = list(dict.fromkeys(branches))
+        if not branches:
+            raise ValueError("Не указано ни одной ветки")
+        if n_jobs is not None and n_jobs < 1:
+            raise ValueError(f"Число параллельных задач должно быть не меньше 1, получено {n_jobs}")
+        _check_max_depth(max_depth)
+
+        os.makedirs(out_dir, exist_ok=True)
+        output_paths = {
+            branch: os.path.join(out_dir, branch.replace('/', '_') + '.png')
+            for branch in branches
+        }
+        if len(set(output_paths.values())) != len(output_paths):
+            raise ValueError("Имена веток дают совпадающие имена файлов изображений")
+
+        count = len(branches)
+        n_jobs = min(n_jobs if n_jobs is not None else os.cpu_count() or 1, count)
+        with cls(repo_path) as visualizer:
+            tips = [visualizer._require_commit(branch) for branch in branches]
+            if max_depth is None and not visualizer._use_pygit2:
+                shared_graph = visualizer._load_shared_graph(list(dict.fromkeys(tips)))
+                visualizer._full_graph = None
+                with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                    pending = set()
+                    for branch, tip in zip(branches, tips):
+                        # Текст Mermaid строится перед самой отправкой, так что
+                        # в памяти одновременно не более n_jobs таких текстов
+                        if len(pending) >= n_jobs:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                future.result()
+                        mermaid_source = visualizer.render_mermaid_graph(_reachable_subgraph(shared_graph, tip))
+                        pending.add(executor.submit(
+                            cls.generate_png, mermaid_source, output_paths[branch], visualizer_path
+                        ))
+                    # Общий граф больше не нужен, пока ожидаются последние ветки
+                    del shared_graph, mermaid_source
+                    for future in pending:
+                        future.result()
+                return output_paths
 
-        # Удалить временный Mermaid файл
-        os.remove(mermaid_path)
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            # list() дожидается всех веток и пробрасывает первую ошибку
+            list(executor.map(
+                _visualize_branch,
+                [cls] * count,
+                [repo_path] * count,
+                tips,
+                [output_paths[branch] for branch in branches],
+                [visualizer_path] * count,
+                [max_depth] * count
+            ))
+        return output_paths
+
+def _check_max_depth(max_depth: Optional[int]):
+    """
+    Проверка ограничения числа коммитов.
+    
+    :param max_depth: Максимальное число коммитов или None
+    :raises ValueError: Если max_depth меньше 1
+    """
+    if max_depth is not None and max_depth < 1:
+        raise ValueError(f"Максимальное число коммитов должно быть не меньше 1, получено {max_depth}")
+
+def _positive_int(value: str) -> int:
+    """
+    Преобразование аргумента командной строки в целое число не меньше 1.
+    
+    :param value: Значение аргумента
+    :return: Целое число
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается целое число, получено {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"ожидается число не меньше 1, получено {number}")
+    return number
+
+def _max_count_args(max_depth: Optional[int]) -> List[str]:
+    """
+    Аргументы git rev-list, ограничивающие число коммитов.
+    
+    :param max_depth: Максимальное число коммитов или None
+    :return: Список аргументов
+    """
+    return [] if max_depth is None else [f'--max-count={max_depth}']
+
+def _reachable_subgraph(graph: Dict[str, Set[str]], tip: str) -> Dict[str, Set[str]]:
+    """
+    Выделение из графа коммитов, достижимых из заданного коммита.
+    
+    Множества родителей не копируются и общие с исходным графом.
+    
+    :param graph: Граф зависимостей
+    :param tip: Хеш-значение начального коммита
+    :return: Словарь зависимостей достижимых коммитов
+    """
+    subgraph = {}
+    stack = [tip]
+    while stack:
+        commit = stack.pop()
+        if commit in subgraph:
+            continue
+        parents = graph[commit]
+        subgraph[commit] = parents
+        stack.extend(parent for parent in parents if parent not in subgraph)
+    return subgraph
+
+def _visualize_branch(cls, repo_path: str, tip: str, output_path: str, visualizer_path: str,
+                      max_depth: Optional[int]):
+    """
+    Построение графа и генерация PNG одной ветки в дочернем процессе visualize_many.
+    
+    :param cls: Класс визуализатора
+    :param repo_path: Путь к git-репозиторию
+    :param tip: Хеш-значение вершины ветки
+    :param output_path: Путь для сохранения PNG
+    :param visualizer_path: Путь к программе визуализации Mermaid
+    :param max_depth: Максимальное число последних коммитов
+    """
+    with cls(repo_path) as visualizer:
+        graph = visualizer.build_dependency_graph(tip, max_depth)
+        visualizer.generate_png(visualizer.render_mermaid_graph(graph), output_path, visualizer_path)
 
 def main():
     parser = argparse.ArgumentParser(description='Визуализация графа зависимостей git-репозитория')
     parser.add_argument('--repo', required=True, help='Путь к git-репозиторию')
-    parser.add_argument('--branch', required=True, help='Имя ветки')
-    parser.add_argument('--output', required=True, help='Путь к файлу изображения')
+    parser.add_argument('--branch', required=True, nargs='+', help='Имя ветки (можно указать несколько)')
+    parser.add_argument('--output', required=True,
+                        help='Путь к файлу изображения (для нескольких веток — каталог)')
     parser.add_argument('--visualizer', default='mmdc', help='Путь к программе для генерации Mermaid графов')
+    parser.add_argument('--jobs', type=_positive_int, default=None,
+                        help='Число параллельных задач для нескольких веток (по умолчанию — число ядер)')
+    parser.add_argument('--max-depth', type=_positive_int, default=None,
+                        help='Максимальное число последних коммитов в графе (по умолчанию — вся история)')
 
     args = parser.parse_args()
 
     try:
-        visualizer = GitDependencyVisualizer(args.repo)
-        visualizer.visualize_dependencies(
-            branch_name=args.branch,
-            output_path=args.output,
-            visualizer_path=args.visualizer
-        )
+        if len(args.branch) == 1:
+            with GitDependencyVisualizer(args.repo) as visualizer:
+                visualizer.visualize_dependencies(
+                    branch_name=args.branch[0],
+                    output_path=args.output,
+                    visualizer_path=args.visualizer,
+                    max_depth=args.max_depth
+                )
+        else:
+            GitDependencyVisualizer.visualize_many(
+                repo_path=args.repo,
+                branches=args.branch,
+                out_dir=args.output,
+                visualizer_path=args.visualizer,
+                n_jobs=args.jobs,
+                max_depth=args.max_depth
+            )
         print("Граф зависимостей успешно создан.")
     except Exception as e:
         print(f"Ошибка: {e}")
@@ -5,7 +5,7 @@ import shutil
 import subprocess
 
 # Импортируем основной класс визуализатора
-from git_dependency_visualizer import GitDependencyVisualizer
+from git_dependency_visualizer import GitDependencyVisualizer, _reachable_subgraph, pygit2
 
 class TestGitDependencyVisualizer(unittest.TestCase):
     def setUp(self):
@@ -67,6 +67,16 @@ class TestGitDependencyVisualizer(unittest.TestCase):
         subprocess.run(['git', 'add', 'update.txt'], cwd=self.test_repo_dir, check=True)
         subprocess.run(['git', 'commit', '-m', 'Update master'], cwd=self.test_repo_dir, check=True)
 
+    def create_fake_visualizer(self):
+        """
+        Создание визуализатора-заглушки, копирующего stdin в файл, переданный после -o
+        """
+        fake_visualizer = os.path.join(self.test_repo_dir, 'fake_mmdc.sh')
+        with open(fake_visualizer, 'w') as f:
+            f.write('#!/bin/sh\ncat > "$4"\n')
+        os.chmod(fake_visualizer, 0o755)
+        return fake_visualizer
+
     def test_get_branch_commits(self):
         """
         Тест получения списка коммитов для ветки
@@ -77,6 +87,21 @@ class TestGitDependencyVisualizer(unittest.TestCase):
         self.assertTrue(len(commits) > 0, "Должны быть коммиты в ветке master")
         self.assertTrue(all(len(commit) == 40 for commit in commits), "Хеш-значения должны иметь длину 40 символов")
 
+    def test_get_branch_commits_max_depth(self):
+        """
+        Тест ограничения числа коммитов ветки
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        commits = visualizer.get_branch_commits('master', max_depth=1)
+        head = subprocess.check_output(
+            ['git', 'rev-parse', 'master'], cwd=self.test_repo_dir, universal_newlines=True
+        ).strip()
+
+        self.assertEqual(commits, {head})
+        for max_depth in (0, -1):
+            with self.assertRaises(ValueError):
+                visualizer.get_branch_commits('master', max_depth=max_depth)
+
     def test_get_commit_parents(self):
         """
         Тест получения родительских коммитов
@@ -103,6 +128,44 @@ class TestGitDependencyVisualizer(unittest.TestCase):
                 self.assertTrue(len(parents) == 0, f"Коммит {commit} не должен иметь родителей")
 
 
+    def test_get_commit_parents_unknown_commit(self):
+        """
+        Тест получения родителей несуществующего коммита и повторного запуска после close
+        """
+        with GitDependencyVisualizer(self.test_repo_dir) as visualizer:
+            self.assertEqual(visualizer.get_commit_parents('0' * 40), set())
+
+            head = subprocess.check_output(
+                ['git', 'rev-parse', 'master'], cwd=self.test_repo_dir, universal_newlines=True
+            ).strip()
+            parents = visualizer.get_commit_parents(head)
+            visualizer.close()
+            self.assertEqual(visualizer.get_commit_parents(head), parents)
+
+    def test_get_commit_parents_cache(self):
+        """
+        Тест повторного получения родителей из кеша без обращения к git
+        """
+        with GitDependencyVisualizer(self.test_repo_dir) as visualizer:
+            graph = visualizer.build_dependency_graph('master')
+            for commit, parents in graph.items():
+                self.assertEqual(visualizer.get_commit_parents(commit), parents)
+            self.assertEqual(set(visualizer._parent_cache), set(graph))
+
+            # Повторный запрос обслуживается из кеша, даже без процесса cat-file
+            visualizer.close()
+            commit = next(iter(graph))
+            parents = set(graph[commit])
+            self.assertEqual(visualizer.get_commit_parents(commit), parents)
+            self.assertIsNone(visualizer._catfile)
+
+            # Изменение результата не должно портить кеш
+            visualizer.get_commit_parents(commit).add('0' * 40)
+            self.assertEqual(visualizer.get_commit_parents(commit), parents)
+
+            # Изменение возвращенного графа тоже не должно портить кеш
+            graph[commit].add('1' * 40)
+            self.assertEqual(visualizer.get_commit_parents(commit), parents)
 
     def test_build_dependency_graph(self):
         """
@@ -118,6 +181,170 @@ class TestGitDependencyVisualizer(unittest.TestCase):
         for commit, parents in graph.items():
             self.assertTrue(isinstance(parents, set), "Родители должны быть множеством")
 
+    def test_build_dependency_graph_matches_commit_parents(self):
+        """
+        Тест совпадения графа с родителями, полученными для каждого коммита отдельно
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        graph = visualizer.build_dependency_graph('master')
+
+        self.assertEqual(set(graph), visualizer.get_branch_commits('master'))
+        for commit, parents in graph.items():
+            self.assertEqual(parents, visualizer.get_commit_parents(commit))
+        self.assertEqual(sum(1 for parents in graph.values() if not parents), 1,
+                         "Должен быть ровно один корневой коммит")
+
+        # Хеш родителя — тот же объект строки, что и ключ графа
+        keys = {commit: commit for commit in graph}
+        for parents in graph.values():
+            for parent in parents:
+                self.assertIs(parent, keys[parent])
+
+    @unittest.skipIf(pygit2 is None, "pygit2 не установлен")
+    def test_build_dependency_graph_pygit2(self):
+        """
+        Тест совпадения графов, построенных через pygit2 и через вызовы git
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        visualizer._use_pygit2 = True
+        pygit2_graph = visualizer.build_dependency_graph('master')
+        visualizer._use_pygit2 = False
+        git_graph = visualizer.build_dependency_graph('master')
+
+        self.assertEqual(pygit2_graph, git_graph)
+        with self.assertRaises(RuntimeError):
+            visualizer._use_pygit2 = True
+            visualizer.build_dependency_graph('no-such-branch')
+
+    def test_build_dependency_graph_max_depth(self):
+        """
+        Тест построения графа только для последних коммитов ветки
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        full_graph = visualizer.build_dependency_graph('master')
+        graph = visualizer.build_dependency_graph('master', max_depth=1)
+
+        self.assertEqual(len(graph), 1)
+        commit, parents = next(iter(graph.items()))
+        self.assertEqual(parents, full_graph[commit])
+        self.assertEqual(visualizer.build_dependency_graph('master', max_depth=100), full_graph)
+        for max_depth in (0, -1):
+            with self.assertRaises(ValueError):
+                visualizer.build_dependency_graph('master', max_depth=max_depth)
+
+    def test_load_shared_graph(self):
+        """
+        Тест выделения графов нескольких веток из общего графа
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        visualizer._use_pygit2 = False
+
+        # Одиночное построение графа не читает историю других веток
+        visualizer.build_dependency_graph('master')
+        self.assertIsNone(visualizer._full_graph)
+
+        branches = ('master', 'feature-branch')
+        tips = [visualizer._require_commit(branch) for branch in branches]
+        shared_graph = visualizer._load_shared_graph(tips)
+        for branch, tip in zip(branches, tips):
+            self.assertEqual(_reachable_subgraph(shared_graph, tip), visualizer.build_dependency_graph(branch))
+        self.assertEqual(set(shared_graph), visualizer.get_branch_commits('master') |
+                         visualizer.get_branch_commits('feature-branch'))
+
+        # Родители коммитов из общего графа читаются без cat-file
+        for commit, parents in shared_graph.items():
+            self.assertEqual(visualizer.get_commit_parents(commit), parents)
+        self.assertIsNone(visualizer._catfile)
+
+    def test_save_mermaid_graph(self):
+        """
+        Тест сохранения графа в формате Mermaid
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        graph = {'b' * 40: {'a' * 40}, 'c' * 40: {'a' * 40, 'b' * 40}, 'a' * 40: set()}
+        mermaid_path = os.path.join(self.test_repo_dir, 'graph.mmd')
+        visualizer.save_mermaid_graph(graph, mermaid_path)
+
+        with open(mermaid_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "graph TD")
+        self.assertEqual(sorted(lines[1:]), [
+            "  aaaaaaa --> bbbbbbb",
+            "  aaaaaaa --> ccccccc",
+            "  bbbbbbb --> ccccccc",
+        ])
+
+    def test_render_mermaid_graph(self):
+        """
+        Тест представления графа в формате Mermaid без записи в файл
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        graph = visualizer.build_dependency_graph('master')
+        source = visualizer.render_mermaid_graph(graph)
+
+        self.assertTrue(source.startswith("graph TD\n"))
+        self.assertEqual(len(source.splitlines()) - 1, sum(len(parents) for parents in graph.values()))
+
+    def test_generate_png(self):
+        """
+        Тест передачи текста Mermaid визуализатору через stdin
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+
+        fake_visualizer = self.create_fake_visualizer()
+
+        output_path = os.path.join(self.test_repo_dir, 'graph.png')
+        visualizer.generate_png("graph TD\n  a --> b\n", output_path, fake_visualizer)
+
+        with open(output_path) as f:
+            self.assertEqual(f.read(), "graph TD\n  a --> b\n")
+
+    def test_visualize_many(self):
+        """
+        Тест параллельной визуализации нескольких веток в отдельные файлы
+        """
+        fake_visualizer = self.create_fake_visualizer()
+
+        out_dir = os.path.join(self.test_repo_dir, 'graphs')
+        output_paths = GitDependencyVisualizer.visualize_many(
+            self.test_repo_dir, ['master', 'feature-branch'], out_dir, fake_visualizer, n_jobs=2
+        )
+
+        self.assertEqual(set(output_paths), {'master', 'feature-branch'})
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        for branch, output_path in output_paths.items():
+            with open(output_path) as f:
+                expected = visualizer.render_mermaid_graph(visualizer.build_dependency_graph(branch))
+                self.assertEqual(sorted(f.read().splitlines()), sorted(expected.splitlines()))
+
+        # С одним потоком ветки отправляются на визуализацию по очереди
+        output_paths = GitDependencyVisualizer.visualize_many(
+            self.test_repo_dir, ['master', 'feature-branch'], out_dir, fake_visualizer, n_jobs=1
+        )
+        for branch, output_path in output_paths.items():
+            with open(output_path) as f:
+                expected = visualizer.render_mermaid_graph(visualizer.build_dependency_graph(branch))
+                self.assertEqual(sorted(f.read().splitlines()), sorted(expected.splitlines()))
+
+        # С max_depth граф каждой ветки строится в своем процессе
+        output_paths = GitDependencyVisualizer.visualize_many(
+            self.test_repo_dir, ['master', 'feature-branch'], out_dir, fake_visualizer, n_jobs=2, max_depth=1
+        )
+        for branch, output_path in output_paths.items():
+            with open(output_path) as f:
+                expected = visualizer.render_mermaid_graph(visualizer.build_dependency_graph(branch, max_depth=1))
+                self.assertEqual(sorted(f.read().splitlines()), sorted(expected.splitlines()))
+
+        with self.assertRaises(RuntimeError):
+            GitDependencyVisualizer.visualize_many(
+                self.test_repo_dir, ['master', 'no-such-branch'], out_dir, fake_visualizer
+            )
+        for n_jobs in (0, -1):
+            with self.assertRaises(ValueError):
+                GitDependencyVisualizer.visualize_many(
+                    self.test_repo_dir, ['master', 'feature-branch'], out_dir, fake_visualizer, n_jobs=n_jobs
+                )
+
     def test_visualize_dependencies(self):
         """
         Тест визуализации зависимостей
@@ -140,5 +367,18 @@ class TestGitDependencyVisualizer(unittest.TestCase):
             if os.path.exists(temp_output_path):
                 os.unlink(temp_output_path)
 
+    def test_visualize_dependencies_unknown_branch(self):
+        """
+        Тест визуализации несуществующей ветки
+        """
+        visualizer = GitDependencyVisualizer(self.test_repo_dir)
+        self.assertEqual(len(visualizer._require_commit('master')), 40)
+        self.assertIsNone(visualizer._resolve_commit('no-such-branch'))
+
+        output_path = os.path.join(self.test_repo_dir, 'graph.png')
+        with self.assertRaises(RuntimeError):
+            visualizer.visualize_dependencies('no-such-branch', output_path)
+        self.assertFalse(os.path.exists(output_path))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file